@@ -1,104 +1,198 @@
+from functools import lru_cache
+
+import numpy as np
 import openpyxl
 from openpyxl import load_workbook, Workbook
 
-# 入力となるExcelファイルを読み込む
+# numba を使う罫線グリッドのセル数の下限
+# （これより小さいシートでは numba の読み込みとコンパイルの時間が探索時間を上回る）
+NUMBA_MIN_CELLS = 5_000_000
+
+
+def _find_rectangles_kernel(top, left, right, bottom):
+    """罫線コード配列から矩形領域 (行, 列, 高さ, 幅) を探索する（numba 用のループ版）"""
+    num_rows, num_cols = top.shape
+    # 見つかった矩形の数に応じて容量を倍にしていく
+    rects = np.empty((16, 4), np.int32)
+    num_rects = 0
+    visited = np.zeros((num_rows, num_cols), np.bool_)
+    for i in range(num_rows):
+        for j in range(num_cols):
+            if visited[i, j] or top[i, j] == 0 or left[i, j] == 0:
+                continue
+            # 横方向に拡張
+            max_width = 1
+            while j + max_width < num_cols and top[i, j + max_width] != 0:
+                max_width += 1
+            # 縦方向に拡張
+            max_height = 1
+            while i + max_height < num_rows and left[i + max_height, j] != 0:
+                max_height += 1
+            # 右と下の罫線を確認
+            borders_ok = True
+            for k in range(max_height):
+                if right[i + k, j + max_width - 1] == 0:
+                    borders_ok = False
+                    break
+            if borders_ok:
+                for k in range(max_width):
+                    if bottom[i + max_height - 1, j + k] == 0:
+                        borders_ok = False
+                        break
+            if borders_ok:
+                if num_rects == rects.shape[0]:
+                    grown = np.empty((2 * rects.shape[0], 4), np.int32)
+                    grown[:num_rects] = rects
+                    rects = grown
+                rects[num_rects, 0] = i
+                rects[num_rects, 1] = j
+                rects[num_rects, 2] = max_height
+                rects[num_rects, 3] = max_width
+                num_rects += 1
+                # 矩形内のセルを訪問済みにする
+                visited[i:i + max_height, j:j + max_width] = True
+    return rects[:num_rects].copy()
+
+
+def _run_lengths(codes, axis):
+    """各セルから axis 方向（0 = 下, 1 = 右）に罫線が連続するセル数を求める"""
+    n = codes.shape[axis]
+    index = np.arange(n, dtype=np.int32)
+    if axis == 0:
+        index = index[:, None]
+    # 各セル以降で最初に罫線が途切れる位置（途切れなければ n）
+    stops = np.where(codes != 0, np.int32(n), index)
+    stops = np.flip(np.minimum.accumulate(np.flip(stops, axis), axis=axis), axis)
+    return stops - index
+
+
+def _find_rectangles_numpy(top, left, right, bottom):
+    """罫線コード配列から矩形領域 (行, 列, 高さ, 幅) を探索する（NumPy 版）"""
+    num_rows, num_cols = top.shape
+    # 幅・高さと右・下の罫線の確認を定数時間で行うため、罫線の連続数を先に求める
+    width_run = _run_lengths(top, 1)
+    height_run = _run_lengths(left, 0)
+    right_run = _run_lengths(right, 0)
+    bottom_run = _run_lengths(bottom, 1)
+    candidates = (top != 0) & (left != 0)
+    rectangles = []
+    visited = np.zeros((num_rows, num_cols), bool)
+    for i in range(num_rows):
+        # 上と左の罫線を持つ未訪問のセルだけを走査
+        cols = np.flatnonzero(candidates[i] & ~visited[i]).tolist()
+        # 同じ行で見つけた矩形の右端（これより左のセルは訪問済み）
+        next_col = 0
+        for j in cols:
+            if j < next_col:
+                continue
+            max_width = int(width_run[i, j])
+            max_height = int(height_run[i, j])
+            # 右と下の罫線を確認
+            if right_run[i, j + max_width - 1] >= max_height and bottom_run[i + max_height - 1, j] >= max_width:
+                rectangles.append((i, j, max_height, max_width))
+                # 矩形内のセルを訪問済みにする
+                visited[i:i + max_height, j:j + max_width] = True
+                next_col = j + max_width
+    return np.array(rectangles, np.int32).reshape(-1, 4)
+
+@lru_cache(maxsize=None)
+def _load_numba_kernel():
+    """numba でコンパイルした探索関数を返す（numba が無い環境では None）"""
+    try:
+        from numba import njit
+    except ImportError:
+        return None
+    return njit(cache=True)(_find_rectangles_kernel)
+
+
+def find_rectangles(top, left, right, bottom):
+    """罫線コード配列から矩形領域 (行, 列, 高さ, 幅) の配列を返す"""
+    # 大きなシートだけ numba を読み込んで使う
+    if top.size >= NUMBA_MIN_CELLS:
+        kernel = _load_numba_kernel()
+        if kernel is not None:
+            return kernel(top, left, right, bottom)
+    return _find_rectangles_numpy(top, left, right, bottom)
+
+
+def _grow_borders(borders, num_rows, num_cols):
+    """罫線配列の容量を (num_rows, num_cols) 以上に広げる（足りない次元は倍にする）"""
+    _, capacity_rows, capacity_cols = borders.shape
+    if num_rows > capacity_rows:
+        capacity_rows = max(2 * capacity_rows, num_rows)
+    if num_cols > capacity_cols:
+        capacity_cols = max(2 * capacity_cols, num_cols)
+    grown = np.zeros((4, capacity_rows, capacity_cols), np.uint8)
+    grown[:, :borders.shape[1], :borders.shape[2]] = borders
+    return grown
+
+
+# 入力となるExcelファイルを読み込む（セルを保持せず逐次読み込む）
 input_file = 'input.xlsx'
-wb = load_workbook(input_file)
+wb = load_workbook(input_file, read_only=True, data_only=True)
+
+# 罫線スタイル名を整数コードに変換する辞書（0 = 罫線なし）
+style_code = {None: 0, 'none': 0}
 
-# 出力用の新しいExcelブックを作成
-new_wb = Workbook()
-# デフォルトで作成されるシートを削除
-new_wb.remove(new_wb.active)
+# 出力用の新しいExcelブックを作成（書き込み専用モードではデフォルトのシートは作成されない）
+new_wb = Workbook(write_only=True)
 
 # 各シートを処理
 for sheet in wb.worksheets:
     ws = sheet
-    min_row = ws.min_row
-    max_row = ws.max_row
-    min_col = ws.min_column
-    max_col = ws.max_column
-
-    num_rows = max_row - min_row + 1
-    num_cols = max_col - min_col + 1
-
-    # セルの罫線情報を取得
-    cell_borders = []
-    for row in ws.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col):
-        row_borders = []
-        for cell in row:
-            borders = {
-                'left': cell.border.left.style,
-                'right': cell.border.right.style,
-                'top': cell.border.top.style,
-                'bottom': cell.border.bottom.style
-            }
-            row_borders.append(borders)
-        cell_borders.append(row_borders)
-
-    rectangles = []
-    visited = [[False]*num_cols for _ in range(num_rows)]
-    for i in range(num_rows):
-        for j in range(num_cols):
-            if visited[i][j]:
+    # シートに記録された寸法情報は正しくないことがあるため使わず、
+    # A1 から全ての行を読みながら罫線配列（上・左・右・下）を広げていく
+    ws.reset_dimensions()
+    values = []
+    borders = np.zeros((4, 64, 16), np.uint8)
+    num_cols = 0
+    for i, row in enumerate(ws.iter_rows()):
+        values.append([cell.value for cell in row])
+        num_cols = max(num_cols, len(row))
+        if i >= borders.shape[1] or len(row) > borders.shape[2]:
+            borders = _grow_borders(borders, i + 1, len(row))
+        for j, cell in enumerate(row):
+            border = cell.border
+            # 空のセル（EmptyCell）は罫線を持たない
+            if border is None:
                 continue
-            borders = cell_borders[i][j]
-            if borders['top'] not in [None, 'none'] and borders['left'] not in [None, 'none']:
-                # 矩形の探索を開始
-                max_height = 1
-                max_width = 1
-                # 横方向に拡張
-                for w in range(1, num_cols - j):
-                    if cell_borders[i][j + w]['top'] not in [None, 'none']:
-                        max_width += 1
-                    else:
-                        break
-                # 縦方向に拡張
-                for h in range(1, num_rows - i):
-                    if cell_borders[i + h][j]['left'] not in [None, 'none']:
-                        max_height += 1
-                    else:
-                        break
-                # 右と下の罫線を確認
-                right_borders_ok = all(cell_borders[i + k][j + max_width - 1]['right'] not in [None, 'none'] for k in range(max_height))
-                bottom_borders_ok = all(cell_borders[i + max_height -1][j + k]['bottom'] not in [None, 'none'] for k in range(max_width))
-                if right_borders_ok and bottom_borders_ok:
-                    rectangle = (i, j, max_height, max_width)
-                    rectangles.append(rectangle)
-                    # 矩形内のセルを訪問済みにする
-                    for x in range(i, i + max_height):
-                        for y in range(j, j + max_width):
-                            visited[x][y] = True
+            borders[0, i, j] = style_code.setdefault(border.top.style, len(style_code))
+            borders[1, i, j] = style_code.setdefault(border.left.style, len(style_code))
+            borders[2, i, j] = style_code.setdefault(border.right.style, len(style_code))
+            borders[3, i, j] = style_code.setdefault(border.bottom.style, len(style_code))
+
+    # 空のシートには矩形が無い
+    num_rows = len(values)
+    if num_rows == 0 or num_cols == 0:
+        continue
+    top, left, right, bottom = borders[:, :num_rows, :num_cols].copy()
+
+    rectangles = find_rectangles(top, left, right, bottom).tolist()
 
     # 抽出した矩形領域を新しいシートとして追加
     for idx, rect in enumerate(rectangles):
         start_row, start_col, height, width = rect
-        data = []
-        for i in range(start_row, start_row + height):
-            row_data = []
-            for j in range(start_col, start_col + width):
-                cell = ws.cell(row=min_row + i, column=min_col + j)
-                row_data.append(cell.value)
-            data.append(row_data)
-        
+        data = [row_values[start_col:start_col + width] for row_values in values[start_row:start_row + height]]
+
         # 矩形領域の左上のセルの一つ上のセルを確認
+        # （行ごとの値は最後のセルまでしか無いため、範囲外は空として扱う）
         header = None
-        cell_above_row = min_row + start_row - 1
-        if cell_above_row >= 1:
-            cell_above = ws.cell(row=cell_above_row, column=min_col + start_col)
-            if cell_above.value is not None and isinstance(cell_above.value, str):
-                header = cell_above.value
+        if start_row >= 1 and start_col < len(values[start_row - 1]):
+            value_above = values[start_row - 1][start_col]
+            if value_above is not None and isinstance(value_above, str):
+                header = value_above
 
         new_sheet_name = f"{ws.title}_Table_{idx + 1}"
         new_ws = new_wb.create_sheet(title=new_sheet_name)
 
-        current_row = 1
         if header:
-            new_ws.cell(row=current_row, column=1, value=header)
-            current_row += 1  # 次の行から表を開始
+            new_ws.append([header])  # 次の行から表を開始
         # データを書き込む
-        for r_idx, row_data in enumerate(data, current_row):
-            for c_idx, value in enumerate(row_data, 1):
-                new_ws.cell(row=r_idx, column=c_idx, value=value)
+        for row_data in data:
+            new_ws.append(row_data)
+
+# 読み込み専用モードで開いたファイルを閉じる
+wb.close()
 
 # 新しいブックを保存
 output_file = 'output.xlsx'